@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import chess
+import chess.pgn
+from .bot import ChessBot
+
+# the engine of a worker process, created once by _init_worker
+_bot = None
+
+
+def _init_worker(weights_path=None):
+    global _bot
+    _bot = ChessBot(weights_path=weights_path)
+
+
+def analyse_position(task: dict) -> dict:
+    """
+    Runs in a worker process.
+    :param task: {"fen": ..., "max_depth": ..., "time_limit": ...} plus any fields to pass through to the result
+    :return: the task with the analysis added, or with an "error" field if it could not be analysed
+    """
+    try:
+        board = chess.Board(task["fen"])
+    except (KeyError, ValueError) as error:
+        # one broken input line should not end a run over thousands of positions
+        return dict(task, error=f"{type(error).__name__}: {error}")
+    if not board.is_valid():
+        return dict(task, error=f"invalid position: {board.status().name}")
+    # positions are unrelated, so a table from the last one only costs memory
+    _bot.transposition_table.clear()
+    _bot.nodes = 0
+
+    start_time = time.time()
+    score, move, pv, depth = _bot.search(board, depth=task.get("max_depth"), time_limit=task.get("time_limit"))
+    time_taken = time.time() - start_time
+
+    result = dict(task)
+    result.update({
+        "score": score,
+        "best_move": move.uci() if move else None,
+        "pv": [pv_move.uci() for pv_move in pv],
+        "depth": depth,
+        "nodes": _bot.nodes,
+        "elapsed": round(time_taken, 4),
+    })
+    return result
+
+
+def read_fens(path):
+    """yields a task per non empty line of a file with one fen per line"""
+    with open(path, 'r') as file:
+        for line_number, line in enumerate(file, 1):
+            fen = line.strip()
+            if fen:
+                yield {"fen": fen, "source": path, "line": line_number}
+
+
+def read_pgn(path):
+    """yields a task for every mainline position of every game in a pgn file"""
+    with open(path, 'r') as file:
+        game_number = 0
+        while True:
+            game = chess.pgn.read_game(file)
+            if game is None:
+                break
+            game_number += 1
+            board = game.board()
+            yield {"fen": board.fen(), "source": path, "game": game_number, "ply": 0}
+            for ply, move in enumerate(game.mainline_moves(), 1):
+                board.push(move)
+                yield {"fen": board.fen(), "source": path, "game": game_number, "ply": ply}
+
+
+def read_tasks(paths):
+    for path in paths:
+        if path.endswith(".pgn"):
+            yield from read_pgn(path)
+        else:
+            yield from read_fens(path)
+
+
+def analyse(tasks, depth=None, time_limit=None, workers=None, max_pending=None, weights_path=None):
+    """
+    Analyses tasks on a pool of worker processes, each with its own engine loaded once.
+    Results are yielded in input order. At most max_pending tasks are read ahead of the
+    result being waited on, so a slow consumer stops the input from being read further.
+    :param tasks: iterable of fen strings or task dicts, a task's own "max_depth" or "time_limit" overrides the defaults
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(weights_path,)) as pool:
+        for task in tasks:
+            if isinstance(task, str):
+                task = {"fen": task}
+            else:
+                task = dict(task)
+            if "max_depth" not in task and "time_limit" not in task:
+                task["max_depth"], task["time_limit"] = depth, time_limit
+
+            pending.append(pool.submit(analyse_position, task))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse every position of fen lists or pgn files, writing jsonl")
+    parser.add_argument("inputs", nargs="+", help="pgn files, or text files with one fen per line")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-pending", type=int, default=None)
+    parser.add_argument("--weights", default=None, help="tuned weights json, see PieceTable.load")
+    parser.add_argument("--output", default=None, help="jsonl file, stdout by default")
+    args = parser.parse_args()
+
+    if args.depth is None and args.time is None:
+        args.depth = 4
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    start_time = time.time()
+    count = errors = 0
+    try:
+        for result in analyse(read_tasks(args.inputs), args.depth, args.time, args.workers,
+                              args.max_pending, args.weights):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            count += 1
+            errors += "error" in result
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    time_taken = time.time() - start_time
+    print(f"Analysed {count} positions in {time_taken:.2f}s, {count / time_taken if time_taken else 0:.1f} positions/s, "
+          f"{errors} could not be analysed",
+          file=sys.stderr)
@@ -0,0 +1,90 @@
+import multiprocessing
+import queue
+import chess
+from .bot import ChessBot, SearchAborted
+
+# the transposition table is kept across positions, until it grows past this many entries
+TABLE_LIMIT = 2_000_000
+
+
+def _engine_loop(commands, results, lines, max_depth, weights_path):
+    """
+    Runs in the engine process. Waits for a fen, deepens multi-pv search on it and sends
+    (fen, depth, [(move uci, score), ...]) after every finished depth. A new fen arriving
+    aborts the current search, None shuts the engine down.
+    """
+    bot = ChessBot(weights_path=weights_path)
+    bot.stop_requested = lambda: not commands.empty()
+
+    fen = commands.get()
+    while fen is not None:
+        board = chess.Board(fen)
+        if len(bot.transposition_table) > TABLE_LIMIT:
+            bot.transposition_table.clear()
+
+        try:
+            depth = 1
+            while depth <= max_depth and not board.is_game_over():
+                top_moves = bot.search_multipv(board, depth, lines)
+                results.put((fen, depth, [(move.uci(), score) for move, score in top_moves]))
+                depth += 1
+        except SearchAborted:
+            pass
+
+        # skip straight to the newest position if several arrived meanwhile
+        fen = commands.get()
+        while fen is not None:
+            try:
+                fen = commands.get_nowait()
+            except queue.Empty:
+                break
+
+
+class AnalysisEngine:
+    """
+    Background engine process for live analysis. The caller only ever does non-blocking
+    queue operations, so a UI loop can poll it every frame.
+    """
+
+    def __init__(self, lines=3, max_depth=6, weights_path=None):
+        self.commands = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_engine_loop, daemon=True,
+                                               args=(self.commands, self.results, lines, max_depth, weights_path))
+        self.fen = None
+        self.depth = 0
+        self.top_moves = []
+
+    def start(self):
+        self.process.start()
+
+    def set_position(self, fen: str):
+        """starts analysing fen, dropping whatever was being searched"""
+        if fen == self.fen:
+            return
+        self.fen = fen
+        self.depth = 0
+        self.top_moves = []
+        self.commands.put(fen)
+
+    def poll(self) -> list:
+        """
+        Takes in any finished depths for the current position.
+        :return: latest [(move uci, score from white's point of view), ...], best first
+        """
+        while True:
+            try:
+                fen, depth, top_moves = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if fen == self.fen and depth > self.depth:
+                self.depth = depth
+                self.top_moves = top_moves
+        return self.top_moves
+
+    def stop(self):
+        if self.process.is_alive():
+            self.commands.put(None)
+            self.process.join(timeout=1)
+            if self.process.is_alive():
+                self.process.terminate()
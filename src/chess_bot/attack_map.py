@@ -0,0 +1,76 @@
+import chess
+
+
+def pawn_attacks(pawns: int, color: bool) -> int:
+    """bitboard of the squares the pawns of color attack, by shifting instead of looping over them"""
+    if color:
+        return ((pawns & ~chess.BB_FILE_A) << 7 | (pawns & ~chess.BB_FILE_H) << 9) & chess.BB_ALL
+    return (pawns & ~chess.BB_FILE_A) >> 9 | (pawns & ~chess.BB_FILE_H) >> 7
+
+
+class AttackMap:
+    """
+    Attacked-by bitboards for a single position, per side and per piece type.
+    Nothing is computed until the first query, so a node that never asks pays nothing.
+    The board must still be at the same position when the map is first queried,
+    so in the search one is created per node and read before any push.
+    """
+
+    def __init__(self, board: chess.Board):
+        self.board = board
+        self._attacks = None  # {color: [bitboard per piece type, index 0 = all pieces]}
+        self._mobility = None  # {color: number of reachable squares for minor/major pieces}
+        self._pawn_attacks = {}  # {color: bitboard}, cheap enough for move ordering on its own
+
+    def _compute(self):
+        board = self.board
+        attacks = {chess.WHITE: [0] * 7, chess.BLACK: [0] * 7}
+        mobility = {chess.WHITE: 0, chess.BLACK: 0}
+
+        for color in chess.COLORS:
+            own = board.occupied_co[color]
+            by_type = attacks[color]
+            for piece_type in chess.PIECE_TYPES:
+                for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                    mask = board.attacks_mask(square)
+                    by_type[piece_type] |= mask
+                    if piece_type != chess.PAWN and piece_type != chess.KING:
+                        mobility[color] += chess.popcount(mask & ~own)
+                by_type[0] |= by_type[piece_type]
+
+        self._attacks = attacks
+        self._mobility = mobility
+
+    def attacked_by(self, color: bool, piece_type: chess.PieceType = None) -> int:
+        """
+        :param color: side doing the attacking
+        :param piece_type: restrict to one piece type, None for every piece
+        :return: bitboard of attacked squares
+        """
+        if piece_type == chess.PAWN:
+            return self.pawn_attacks(color)
+        if self._attacks is None:
+            self._compute()
+        return self._attacks[color][piece_type or 0]
+
+    def is_attacked(self, color: bool, square: chess.Square, piece_type: chess.PieceType = None) -> bool:
+        return bool(self.attacked_by(color, piece_type) & chess.BB_SQUARES[square])
+
+    def pawn_attacks(self, color: bool) -> int:
+        """pawn attacks of color alone, without building the full map"""
+        if color not in self._pawn_attacks:
+            self._pawn_attacks[color] = pawn_attacks(self.board.pawns & self.board.occupied_co[color], color)
+        return self._pawn_attacks[color]
+
+    def mobility(self, color: bool) -> int:
+        """pseudo-legal target squares of knights, bishops, rooks and queens, own pieces excluded"""
+        if self._mobility is None:
+            self._compute()
+        return self._mobility[color]
+
+    def king_zone(self, color: bool) -> int:
+        """bitboard of the king square of color and the squares around it"""
+        king = self.board.king(color)
+        if king is None:
+            return 0
+        return chess.BB_KING_ATTACKS[king] | chess.BB_SQUARES[king]
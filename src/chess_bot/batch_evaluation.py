@@ -0,0 +1,152 @@
+from itertools import chain
+from operator import attrgetter, itemgetter
+import chess
+import numpy as np
+from .evaluation import Evaluation
+
+# order of the 12 piece bitboards of a position: white pawn .. white king, black pawn .. black king
+PLANES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+
+def board_to_bitboards(board: chess.Board) -> list:
+    """the 12 piece bitboards of board in PLANES order"""
+    white, black = board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK]
+    pieces = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+    return [mask & white for mask in pieces] + [mask & black for mask in pieces]
+
+
+_piece_masks = attrgetter("pawns", "knights", "bishops", "rooks", "queens", "kings")
+_white_mask = itemgetter(chess.WHITE)
+
+
+def boards_to_bitboards(boards) -> np.ndarray:
+    """
+    board_to_bitboards for a whole list of boards at once, as an (N, 12) uint64 array.
+    Only the 6 piece masks and the white occupancy are read per board, through C level getters,
+    and split by color with NumPy.
+    """
+    boards = list(boards)
+    count = len(boards)
+    pieces = np.fromiter(chain.from_iterable(map(_piece_masks, boards)), dtype=np.uint64, count=6 * count)
+    pieces = pieces.reshape(count, 6)
+    white = np.fromiter(map(_white_mask, map(attrgetter("occupied_co"), boards)), dtype=np.uint64, count=count)
+    white = white[:, None]
+    return np.concatenate([pieces & white, pieces & ~white], axis=1)
+
+
+class BatchEvaluation:
+    """
+    Scores many positions at once with NumPy.
+    Gives exactly Evaluation.evaluate_material + Evaluation.evaluate_piece_tables, the terms that only
+    depend on where the pieces stand. Game over scores, pawn structure, attack terms and the eval cache
+    are left to the scalar evaluator.
+
+    Each bitboard is unpacked into its 8 bytes. Material and phase come from per plane piece counts, and
+    the piece tables from lookup tables holding, for every (plane, byte, byte value), the summed table
+    values of the squares set in that byte, so a position costs 48 gathers per table.
+
+    evaluate_bitboards is the fast path, for positions already stored as bitboards (e.g. tuner batches).
+    evaluate_boards also pays for reading the bitboards off each chess.Board.
+    """
+
+    # piece table sums, blended by phase like evaluate_piece_tables does
+    _BASE, _PAWN_MID, _PAWN_END, _KING_MID, _KING_END = range(5)
+    # rows per chunk, keeps the gathered blocks small
+    CHUNK_SIZE = 8192
+
+    _POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+    def __init__(self, evaluation: Evaluation = None):
+        self.evaluation = evaluation or Evaluation()
+        piece_values = self.evaluation.piece_values
+
+        # material value of one piece on each plane, negative for black
+        self.material_weights = np.array(
+            [piece_values[piece_type] * (1 if color else -1) for color, piece_type in PLANES], dtype=np.int64)
+        self.phase_weights = np.array(
+            [self.evaluation.PHASE_WEIGHTS.get(piece_type, 0) for _, piece_type in PLANES], dtype=np.int64)
+
+        # evaluate_piece_tables only scores the pieces of the evaluated color, so each color
+        # needs lookup tables for its own 6 planes only
+        self.lookup = {color: self._byte_lookup(self._square_weights(color)) for color in chess.COLORS}
+        self._row_offsets = np.arange(6 * 8) * 256
+        self._byte_columns = {chess.WHITE: slice(0, 48), chess.BLACK: slice(48, 96)}
+
+    def _square_weights(self, color: bool) -> np.ndarray:
+        """(6, 64, 5) table value of each of color's pieces on each square"""
+        pt = self.evaluation.piece_table
+        columns = {
+            chess.KNIGHT: [(self._BASE, pt.KNIGHTS)],
+            chess.BISHOP: [(self._BASE, pt.BISHOPS)],
+            chess.ROOK: [(self._BASE, pt.ROOKS)],
+            chess.QUEEN: [(self._BASE, pt.QUEENS)],
+            chess.PAWN: [(self._PAWN_MID, pt.PAWNS_MID), (self._PAWN_END, pt.PAWNS_END)],
+            chess.KING: [(self._KING_MID, pt.KING_EARLY), (self._KING_END, pt.KING_END)],
+        }
+        weights = np.zeros((6, 64, 5), dtype=np.int32)
+        for plane, piece_type in enumerate(chess.PIECE_TYPES):
+            for column, table in columns[piece_type]:
+                for square in chess.SQUARES:
+                    weights[plane, square, column] = pt.read(color, table, square)
+        return weights
+
+    @staticmethod
+    def _byte_lookup(weights: np.ndarray) -> list:
+        """one (6 * 8 * 256,) lookup table per column, indexed by plane, byte and byte value"""
+        bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder='little').astype(np.int32)
+        per_byte = weights.reshape(6, 8, 8, -1)  # plane, byte, bit, column
+        lookup = np.einsum('vb,pkbc->pkvc', bits, per_byte).reshape(6 * 8 * 256, -1)
+        return [np.ascontiguousarray(lookup[:, column]) for column in range(lookup.shape[1])]
+
+    @staticmethod
+    def unpack(bitboards) -> np.ndarray:
+        """
+        :param bitboards: (N, 12) array-like of piece bitboards in PLANES order
+        :return: (N, 96) uint8 array, the little endian bytes of every bitboard
+        """
+        bitboards = np.ascontiguousarray(bitboards, dtype='<u8').reshape(-1, len(PLANES))
+        return bitboards.view(np.uint8).reshape(len(bitboards), len(PLANES) * 8)
+
+    def evaluate_bitboards(self, bitboards, colors) -> np.ndarray:
+        """
+        :param bitboards: (N, 12) array-like of piece bitboards in PLANES order
+        :param colors: (N,) array-like, the color passed to the scalar evaluator for each position
+        :return: (N,) int64 array of scores
+        """
+        unpacked = self.unpack(bitboards)
+        colors = np.asarray(colors, dtype=bool)
+
+        counts = self._POPCOUNT[unpacked].reshape(len(unpacked), len(PLANES), 8).sum(axis=2)
+        material = counts @ self.material_weights
+        phase = np.minimum(counts @ self.phase_weights, self.evaluation.MAX_PHASE)
+
+        tables = np.empty((5, len(unpacked)), dtype=np.int64)
+        for start in range(0, len(unpacked), self.CHUNK_SIZE):
+            chunk = slice(start, start + self.CHUNK_SIZE)
+            chunk_bytes, chunk_colors, chunk_tables = unpacked[chunk], colors[chunk], tables[:, chunk]
+            for color in chess.COLORS:
+                selected = chunk_colors == color
+                rows = chunk_bytes[selected][:, self._byte_columns[color]] + self._row_offsets
+                for column, lookup in enumerate(self.lookup[color]):
+                    chunk_tables[column, selected] = lookup[rows].sum(axis=1)
+
+        score = material + tables[self._BASE]
+        score += self._blend_phase(tables[self._PAWN_MID], tables[self._PAWN_END], phase)
+        score += self._blend_phase(tables[self._KING_MID], tables[self._KING_END], phase)
+        return score
+
+    def _blend_phase(self, mid: np.ndarray, end: np.ndarray, phase: np.ndarray) -> np.ndarray:
+        max_phase = self.evaluation.MAX_PHASE
+        return (mid * phase + end * (max_phase - phase)) // max_phase
+
+    def evaluate_boards(self, boards, colors=None) -> np.ndarray:
+        """
+        :param boards: iterable of chess.Board
+        :param colors: color to evaluate for each board, defaults to the side to move
+        :return: (N,) int64 array of scores
+        """
+        boards = list(boards)
+        bitboards = boards_to_bitboards(boards)
+        if colors is None:
+            colors = [board.turn for board in boards]
+        return self.evaluate_bitboards(bitboards, colors)
@@ -0,0 +1,245 @@
+import argparse
+import os
+import time
+from array import array
+from collections import deque
+import chess
+from .evaluation import Evaluation, KNOWN_WIN
+
+BITBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../assets/bitbases")
+
+# squares the single piece may stand on after normalization, the pawn is kept on files a-d of ranks 2-7
+PIECE_SQUARES = {
+    chess.PAWN: [chess.square(file, rank) for rank in range(1, 7) for file in range(4)],
+    chess.ROOK: list(chess.SQUARES),
+}
+NAMES = {chess.PAWN: "kpk", chess.ROOK: "krk"}
+
+
+def _piece_index(piece_type: chess.PieceType):
+    return {square: index for index, square in enumerate(PIECE_SQUARES[piece_type])}
+
+
+_piece_index_cache = {piece_type: _piece_index(piece_type) for piece_type in PIECE_SQUARES}
+
+
+def table_size(piece_type: chess.PieceType) -> int:
+    return 2 * 64 * 64 * len(PIECE_SQUARES[piece_type])
+
+
+def _index(turn, white_king, black_king, piece_index, piece_count) -> int:
+    """index of a normalized position, white being the side with the extra piece"""
+    return ((int(turn) * 64 + white_king) * 64 + black_king) * piece_count + piece_index
+
+
+def generate(piece_type: chess.PieceType) -> bytearray:
+    """
+    Retrograde analysis of king and pawn or king and rook against king, white having the extra piece.
+    Every position gets its successors from python-chess move generation, then wins spread backwards
+    from checkmates and safe promotions: a white to move position is won once one successor is,
+    a black to move position once all of its moves are.
+    :return: bit-packed table, bit set when white wins
+    """
+    squares = PIECE_SQUARES[piece_type]
+    index_of = _piece_index_cache[piece_type]
+    piece_count = len(squares)
+    size = table_size(piece_type)
+
+    won = bytearray(size)
+    remaining = array('i', bytes(4 * size))  # black to move: moves not yet known to lose
+    successor_start = array('i', [0])
+    successors = array('i')
+    seeds = []
+
+    board = chess.Board(None)
+    white_piece = chess.Piece(piece_type, chess.WHITE)
+    for position in range(size):
+        rest, piece_index = divmod(position, piece_count)
+        rest, black_king = divmod(rest, 64)
+        turn, white_king = divmod(rest, 64)
+        piece_square = squares[piece_index]
+
+        if len({white_king, black_king, piece_square}) < 3 or chess.square_distance(white_king, black_king) < 2:
+            successor_start.append(len(successors))
+            continue
+        board.set_piece_map({white_king: chess.Piece(chess.KING, chess.WHITE),
+                             black_king: chess.Piece(chess.KING, chess.BLACK),
+                             piece_square: white_piece})
+        board.turn = bool(turn)
+        if board.was_into_check():
+            successor_start.append(len(successors))
+            continue
+
+        moves = list(board.legal_moves)
+        if board.turn == chess.BLACK:
+            remaining[position] = len(moves)
+            if not moves and board.is_check():
+                seeds.append(position)
+
+        for move in moves:
+            if move.promotion:
+                if move.promotion in (chess.QUEEN, chess.ROOK) and _safe_promotion(board, move):
+                    seeds.append(position)
+                continue
+            board.push(move)
+            if chess.popcount(board.occupied) == 3:
+                successors.append(_index(board.turn, board.king(chess.WHITE), board.king(chess.BLACK),
+                                         index_of[move.to_square if move.from_square == piece_square
+                                                  else piece_square], piece_count))
+            board.pop()
+        successor_start.append(len(successors))
+
+    # reverse the successor lists into predecessor lists
+    predecessor_count = array('i', bytes(4 * (size + 1)))
+    for successor in successors:
+        predecessor_count[successor + 1] += 1
+    for position in range(size):
+        predecessor_count[position + 1] += predecessor_count[position]
+    predecessor_start = array('i', predecessor_count)
+    predecessors = array('i', bytes(4 * len(successors)))
+    for position in range(size):
+        for edge in range(successor_start[position], successor_start[position + 1]):
+            successor = successors[edge]
+            predecessors[predecessor_count[successor]] = position
+            predecessor_count[successor] += 1
+
+    queue = deque()
+    for position in seeds:
+        if not won[position]:
+            won[position] = 1
+            queue.append(position)
+    # positions from here on have white to move
+    white_offset = 64 * 64 * piece_count
+    while queue:
+        position = queue.popleft()
+        for edge in range(predecessor_start[position], predecessor_start[position + 1]):
+            predecessor = predecessors[edge]
+            if won[predecessor]:
+                continue
+            if predecessor >= white_offset:
+                won[predecessor] = 1
+                queue.append(predecessor)
+            else:
+                remaining[predecessor] -= 1
+                if remaining[predecessor] == 0:
+                    won[predecessor] = 1
+                    queue.append(predecessor)
+
+    packed = bytearray((size + 7) // 8)
+    for position in range(size):
+        if won[position]:
+            packed[position >> 3] |= 1 << (position & 7)
+    return packed
+
+
+def _safe_promotion(board: chess.Board, move: chess.Move) -> bool:
+    """the promoted piece can not be taken for free and black is not stalemated"""
+    board.push(move)
+    try:
+        if board.is_checkmate():
+            return True
+        if not any(board.generate_legal_moves()):
+            return False
+        black_king = board.king(chess.BLACK)
+        white_king = board.king(chess.WHITE)
+        return chess.square_distance(black_king, move.to_square) > 1 or \
+            chess.square_distance(white_king, move.to_square) == 1
+    finally:
+        board.pop()
+
+
+class Bitbases:
+    """
+    Probes the KPK and KRK bitbases written by generate, whichever files are present.
+    A probe normalizes the position so white has the extra piece (and the pawn is on files a-d)
+    and reads one bit.
+    """
+
+    def __init__(self, directory=BITBASE_DIR, evaluation: Evaluation = None):
+        """:param evaluation: supplies the mop up term known wins in KRK are scored with"""
+        self.tables = {}
+        self.evaluation = evaluation or Evaluation()
+        for piece_type, name in NAMES.items():
+            path = os.path.join(directory, f"{name}.bin")
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as file:
+                data = file.read()
+            if len(data) != (table_size(piece_type) + 7) // 8:
+                raise ValueError(f"{path} has {len(data)} bytes, expected {(table_size(piece_type) + 7) // 8}")
+            self.tables[piece_type] = data
+        self.hits = 0
+
+    def probe(self, board: chess.Board):
+        """
+        :return: 1 if white wins, -1 if black wins, 0 for a draw, None if the position is not covered
+        """
+        if chess.popcount(board.occupied) != 3:
+            return None
+        if board.pawns:
+            piece_type, piece_mask = chess.PAWN, board.pawns
+        elif board.rooks:
+            piece_type, piece_mask = chess.ROOK, board.rooks
+        else:
+            return None
+        table = self.tables.get(piece_type)
+        if table is None:
+            return None
+
+        piece_square = chess.lsb(piece_mask)
+        strong = board.color_at(piece_square)
+        strong_king = board.king(strong)
+        weak_king = board.king(not strong)
+        turn = board.turn
+        if strong == chess.BLACK:
+            strong_king, weak_king, piece_square = (chess.square_mirror(strong_king), chess.square_mirror(weak_king),
+                                                    chess.square_mirror(piece_square))
+            turn = not turn
+        if piece_type == chess.PAWN and chess.square_file(piece_square) > 3:
+            strong_king, weak_king, piece_square = strong_king ^ 7, weak_king ^ 7, piece_square ^ 7
+
+        squares = PIECE_SQUARES[piece_type]
+        index = _index(turn, strong_king, weak_king, _piece_index_cache[piece_type][piece_square], len(squares))
+        self.hits += 1
+        if table[index >> 3] >> (index & 7) & 1:
+            return 1 if strong else -1
+        return 0
+
+    def probe_score(self, board: chess.Board, ply: int):
+        """:return: score from white's point of view, or None if the position is not covered"""
+        return self.score(board, self.probe(board), ply)
+
+    def score(self, board: chess.Board, result, ply: int):
+        """:param result: what probe returned for board"""
+        if not result:
+            return result
+        winner = result > 0
+        score = KNOWN_WIN - ply + self._progress(board, winner)
+        return score if winner else -score
+
+    def _progress(self, board: chess.Board, winner: bool) -> int:
+        """prefers advanced pawns, and in KRK a cornered defending king with the kings close"""
+        if board.pawns:
+            rank = chess.square_rank(chess.lsb(board.pawns))
+            return 20 * (rank if winner else 7 - rank)
+        return self.evaluation.mop_up(board, winner)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the KPK and KRK bitbases by retrograde analysis")
+    parser.add_argument("--output", default=BITBASE_DIR)
+    parser.add_argument("--tables", nargs="+", default=list(NAMES.values()), choices=list(NAMES.values()))
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for piece_type, name in NAMES.items():
+        if name not in args.tables:
+            continue
+        start_time = time.time()
+        packed = generate(piece_type)
+        wins = sum(bin(byte).count("1") for byte in packed)
+        path = os.path.join(args.output, f"{name}.bin")
+        with open(path, 'wb') as file:
+            file.write(packed)
+        print(f"{name}: {table_size(piece_type)} positions, {wins} wins, {len(packed)} bytes "
+              f"written to {path} in {time.time() - start_time:.1f}s")
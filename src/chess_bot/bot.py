@@ -1,21 +1,37 @@
 import chess
 from .chess_board import ChessBoard
 from .evaluation import Evaluation
+from .attack_map import AttackMap
+from .bitbase import Bitbases
 from .opening_book import OpeningBook
+import os
 import time
 
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../assets/Book.txt")
+
+
+class SearchAborted(Exception):
+    """raised inside minimax when the search deadline has passed or stop_requested returns True"""
+
+
 class ChessBot:
-    def __init__(self):
+    def __init__(self, book_path=BOOK_PATH, weights_path=None):
         self.log_file = "None"
         self.transposition_table = {}
-        self.evaluation = Evaluation()
-        self.opening_book = OpeningBook("../assets/Book.txt")
-
-    def score_move(self, board: chess.Board, move: chess.Move) -> int:
+        self.nodes = 0
+        self.deadline = None  # time.time() value after which minimax gives up, None for no limit
+        self.stop_requested = None  # optional callable, minimax gives up once it returns True
+        self.evaluation = Evaluation(weights_path=weights_path)
+        self.opening_book = OpeningBook(book_path)
+        self.bitbases = Bitbases(evaluation=self.evaluation)  # KPK and KRK, whichever files have been generated
+        self.profiler = None  # SearchProfiler while profiling is enabled
+
+    def score_move(self, board: chess.Board, move: chess.Move, attack_map: AttackMap = None) -> int:
         """
         TODO: Probably move this to some sort of ordering moves file/class
         :param board: chess.Board object holding game state
         :param move: chess.Move object holding move to be scored
+        :param attack_map: optional AttackMap of board, used to push back moves onto pawn-guarded squares
         :return: score of the move
         """
         piece_values = {
@@ -41,6 +57,12 @@ class ChessBot:
             else:
                 score += 200  # smaller boost
 
+        # Moving a piece where an enemy pawn can take it is rarely best
+        if attack_map is not None and attack_map.is_attacked(not board.turn, move.to_square, chess.PAWN):
+            moving_piece = board.piece_type_at(move.from_square)
+            if moving_piece and moving_piece != chess.PAWN:
+                score -= piece_values[moving_piece] // 2
+
         return score
 
     def get_transposition_key(self, board: chess.Board, depth: int, maximizing_player: bool):
@@ -57,9 +79,38 @@ class ChessBot:
         Minimax implementation.
         Returns (best_score, best_move)
         """
+        self.nodes += 1
+        if self.nodes & 127 == 0:
+            if self.deadline is not None and time.time() > self.deadline:
+                raise SearchAborted()
+            if self.stop_requested is not None and self.stop_requested():
+                raise SearchAborted()
+
+        # Exact results in KPK and KRK. Draws and losses for the side to move at the root are cut off,
+        # its wins are searched on so it finds the mate, with leaves scored by the bitbase progress term.
+        # The root is always searched so there is a move to return.
+        bitbase_result = None
+        if ply > 0:
+            bitbase_result = self.bitbases.probe(board)
+            if bitbase_result is not None and board.is_checkmate():
+                bitbase_result = None
+            if bitbase_result is not None:
+                root_color = board.turn if ply % 2 == 0 else not board.turn
+                if bitbase_result != (1 if root_color else -1):
+                    return self.bitbases.score(board, bitbase_result, ply), None
+
+            # in a won ending going back to an earlier position makes no progress, so it is scored as a draw
+            if (bitbase_result is not None or self.evaluation.bare_king_winner(board) is not None) \
+                    and board.is_repetition(2):
+                return 0, None
+            if bitbase_result is not None and depth == 0:
+                return self.bitbases.score(board, bitbase_result, ply), None
+
+        # One attack map per node, shared by move ordering here or the evaluation at a leaf
+        attack_map = AttackMap(board)
 
         if depth == 0 or board.is_game_over():
-            return self.evaluation.evaluate_position(board, ply, maximizing_player), None
+            return self.evaluation.evaluate_position(board, ply, maximizing_player, attack_map), None
 
         tt_key = self.get_transposition_key(board, depth, maximizing_player)
 
@@ -70,7 +121,7 @@ class ChessBot:
 
         # Gather moves and sort them
         moves = list(board.legal_moves)
-        moves.sort(key=lambda m: self.score_move(board, m), reverse=True)
+        moves.sort(key=lambda m: self.score_move(board, m, attack_map), reverse=True)
 
         if maximizing_player:
             best_eval = float('-inf')
@@ -112,6 +163,111 @@ class ChessBot:
             self.transposition_table[tt_key] = (best_eval, best_move)
             return best_eval, best_move
 
+    def search(self, board: chess.Board, depth=None, time_limit=None):
+        """
+        Iterative deepening minimax without the book, printing or logging, for analysis.
+        At least depth 1 is always finished, after that an iteration cut off by time_limit is thrown away.
+        :param depth: deepest iteration, None to search until time_limit runs out
+        :param time_limit: seconds, None for no limit
+        :return: (score from white's point of view, best move, principal variation, depth completed)
+        """
+        if depth is None and time_limit is None:
+            raise ValueError("search needs a depth or a time limit")
+
+        # minimax pushes and pops on the board, a timeout would leave the caller's board mid search
+        board = board.copy()
+        start_time = time.time()
+        self.deadline = None
+        result = (self.evaluation.evaluate_position(board, 0, board.turn), None, [], 0)
+
+        current_depth = 1
+        try:
+            while (depth is None or current_depth <= depth) and not board.is_game_over():
+                score, move = self.minimax(board, current_depth, -float('inf'), float('inf'), board.turn)
+                result = (score, move, self.principal_variation(board, current_depth), current_depth)
+                if time_limit is not None:
+                    self.deadline = start_time + time_limit
+                    if time.time() > self.deadline:
+                        break
+                current_depth += 1
+        except SearchAborted:
+            pass
+        finally:
+            self.deadline = None
+
+        return result
+
+    def search_multipv(self, board: chess.Board, depth: int, lines: int) -> list:
+        """
+        Scores the best root moves to depth, for showing several candidate moves at once.
+        Each root move is searched with the window opened only as far as the current worst of the top lines,
+        so moves that cannot make it in are cut off early.
+        May raise SearchAborted through deadline or stop_requested.
+        :return: up to lines (move, score from white's point of view), best for the side to move first
+        """
+        board = board.copy()
+        maximizing = board.turn
+        moves = list(board.legal_moves)
+        attack_map = AttackMap(board)
+        moves.sort(key=lambda m: self.score_move(board, m, attack_map), reverse=True)
+
+        scored = []
+        for move in moves:
+            threshold = scored[-1][1] if len(scored) >= lines else None
+            board.push(move)
+            if maximizing:
+                alpha = threshold if threshold is not None else -float('inf')
+                score, _ = self.minimax(board, depth - 1, alpha, float('inf'), False, 1)
+            else:
+                beta = threshold if threshold is not None else float('inf')
+                score, _ = self.minimax(board, depth - 1, -float('inf'), beta, True, 1)
+            board.pop()
+
+            if threshold is None or (score > threshold if maximizing else score < threshold):
+                scored.append((move, score))
+                scored.sort(key=lambda line: line[1], reverse=maximizing)
+                del scored[lines:]
+
+        return scored
+
+    def principal_variation(self, board: chess.Board, depth: int) -> list:
+        """follows the best moves stored in the transposition table from board"""
+        board = board.copy(stack=False)
+        pv = []
+        while depth > 0:
+            entry = self.transposition_table.get(self.get_transposition_key(board, depth, board.turn))
+            if entry is None or entry[1] is None or entry[1] not in board.legal_moves:
+                break
+            pv.append(entry[1])
+            board.push(entry[1])
+            depth -= 1
+        return pv
+
+    def clear_search_state(self):
+        """empties the transposition table, eval cache and pawn hash and zeroes the counters, for comparable runs"""
+        self.transposition_table.clear()
+        self.evaluation.eval_cache.clear()
+        self.evaluation.pawn_structure.table.clear()
+        self.nodes = 0
+        self.bitbases.hits = 0
+
+    def search_stats(self) -> dict:
+        """counters gathered since the bot was created"""
+        return {
+            "nodes": self.nodes,
+            "eval_cache_hit_rate": self.evaluation.eval_cache.hit_rate(),
+            "pawn_hash_hit_rate": self.evaluation.pawn_structure.table.hit_rate(),
+            "bitbase_hits": self.bitbases.hits,
+        }
+
+    def format_search_stats(self, time_taken: float) -> str:
+        stats = self.search_stats()
+        nps = stats["nodes"] / time_taken if time_taken else 0
+        return (f"Nodes: {stats['nodes']}, NPS: {nps:.0f}, "
+                f"eval cache hits: {stats['eval_cache_hit_rate']:.1%}, "
+                f"pawn hash hits: {stats['pawn_hash_hit_rate']:.1%}, "
+                f"bitbase hits: {stats['bitbase_hits']}")
+
     def get_move(self, board: ChessBoard) -> chess.Move:
         """
         Main method to select the best move.
@@ -125,20 +281,59 @@ class ChessBot:
 
         print("no book move found")
 
+        search_board = state
+        if self.profiler is not None:
+            # the report covers this move only
+            self.profiler.reset()
+            search_board = self.profiler.instrument_board(state)
+            self.profiler.enter("search")
+
         start_time = time.time()
-        eval_m, move_m = self.minimax(state, depth=5, alpha=-float('inf'), beta=float('inf'), maximizing_player=board.get_board_state().turn)
+        try:
+            eval_m, move_m = self.minimax(search_board, depth=5, alpha=-float('inf'), beta=float('inf'), maximizing_player=board.get_board_state().turn)
+        finally:
+            # an aborted search still closes its region, so later timings are not charged to it
+            if self.profiler is not None:
+                self.profiler.exit()
         time_taken = time.time() - start_time
 
+        if self.profiler is not None:
+            print(self.profiler.report())
+
 
         # Each time you pick a move for logging:
         self.log_move(move_m, eval_m)
 
         print(f"Player: {state.turn}")
         print(f"Best move: {move_m}, Evaluation: {eval_m}, found in {time_taken:.4f} seconds.")
+        print(self.format_search_stats(time_taken))
         return move_m
 
 
 
+    def enable_profiling(self):
+        """
+        Times move ordering, transposition keys and evaluation from now on, and in get_move also
+        move generation and push/pop. The wrappers shadow the methods on this instance only.
+        :return: the SearchProfiler collecting the timings
+        """
+        # imported here so python -m chess_bot.profiler does not find itself imported already
+        from .profiler import SearchProfiler
+
+        if self.profiler is None:
+            self.profiler = SearchProfiler()
+            self.score_move = self.profiler.timed("move ordering", self.score_move)
+            self.get_transposition_key = self.profiler.timed("transposition key", self.get_transposition_key)
+            self.evaluation.evaluate_position = self.profiler.timed("evaluation", self.evaluation.evaluate_position)
+        return self.profiler
+
+    def disable_profiling(self):
+        if self.profiler is not None:
+            del self.score_move
+            del self.get_transposition_key
+            del self.evaluation.evaluate_position
+            self.profiler = None
+
     def start_game_log(self, filename="minimax_vs_negamax.log"):
         self.log_file = filename
         # "w" mode overwrites the file or creates it if it doesn't exist
@@ -1,9 +1,55 @@
 import chess
 from .piece_table import PieceTable
+from .attack_map import AttackMap
+from .pawn_structure import PawnStructure
+from .hash_table import HashTable
+
+# scores of known wins sit below mate scores (10000 - ply) and above any material balance left in these endings
+KNOWN_WIN = 5000
+
+
+class EvalCache(HashTable):
+    """Static evaluations keyed by position hash, checked before evaluate_position does any work"""
+
+    # the piece table score depends on which color is evaluated, so that color is mixed into the key
+    COLOR_KEY = 0x9D39247E33776D41
+
+    def key(self, board: chess.Board, color: bool) -> int:
+        # hashing python-chess's own position tuple costs a fraction of a from scratch zobrist hash
+        key = hash(board._transposition_key())
+        return key ^ self.COLOR_KEY if color else key
 
 class Evaluation:
-    def __init__(self):
-        self.piece_table = PieceTable()
+    MOBILITY_WEIGHT = 2
+    # weight per king zone square attacked, by attacking piece type
+    KING_ATTACK_WEIGHTS = {
+        chess.PAWN: 2,
+        chess.KNIGHT: 6,
+        chess.BISHOP: 6,
+        chess.ROOK: 8,
+        chess.QUEEN: 12,
+    }
+
+    # game phase weight of each piece type, a full set of pieces adds up to MAX_PHASE
+    PHASE_WEIGHTS = {
+        chess.KNIGHT: 1,
+        chess.BISHOP: 1,
+        chess.ROOK: 2,
+        chess.QUEEN: 4,
+    }
+    MAX_PHASE = 24
+
+    # per square of king distance in mop_up, outweighs the winning king's own pull to the centre in KING_END
+    MOP_UP_DISTANCE_WEIGHT = 20
+
+    def __init__(self, use_attack_terms=True, use_pawn_structure=True, use_eval_cache=True, weights_path=None):
+        """:param weights_path: optional json of piece tables and piece values, see PieceTable.load"""
+        self.piece_table = PieceTable(weights_path)
+        self.pawn_structure = PawnStructure()
+        self.eval_cache = EvalCache(size_bits=16)
+        self.use_eval_cache = use_eval_cache
+        self.use_attack_terms = use_attack_terms  # mobility and king safety, off to benchmark without them
+        self.use_pawn_structure = use_pawn_structure
         self.piece_values = {
             1: 100,
             2: 300,
@@ -12,17 +58,39 @@ class Evaluation:
             5: 900,
             6: 20000
         }
+        if self.piece_table.piece_values:
+            self.piece_values.update(self.piece_table.piece_values)
 
-    def evaluate_position(self, board: chess.Board, depth_searched: int, color: bool) -> int:
+    def evaluate_position(self, board: chess.Board, depth_searched: int, color: bool, attack_map: AttackMap = None) -> int:
 
         if board.is_game_over():
             if board.is_checkmate():
                 return (-10000+depth_searched) if board.turn else (10000-depth_searched)
             return 0 # draw
 
+        # game over scores depend on the ply, so only the static evaluation below is cached
+        if self.use_eval_cache:
+            cache_key = self.eval_cache.key(board, color)
+            cached = self.eval_cache.probe(cache_key)
+            if cached is not None:
+                return cached
+
         score = 0
         score += self.evaluate_material(board)
         score += self.evaluate_piece_tables(board, color)
+        score += self.evaluate_mop_up(board)
+
+        if self.use_pawn_structure:
+            score += self.pawn_structure.evaluate(board)
+
+        if self.use_attack_terms:
+            if attack_map is None:
+                attack_map = AttackMap(board)
+            score += self.evaluate_mobility(attack_map)
+            score += self.evaluate_king_safety(attack_map)
+
+        if self.use_eval_cache:
+            self.eval_cache.store(cache_key, score)
 
         return score
 
@@ -34,12 +102,53 @@ class Evaluation:
             score -= len(board.pieces(piece, False)) * self.piece_values[piece]
         return score
 
+    def evaluate_mobility(self, attack_map: AttackMap) -> int:
+        """rewards the side whose pieces reach more squares"""
+        return self.MOBILITY_WEIGHT * (attack_map.mobility(True) - attack_map.mobility(False))
+
+    def evaluate_mop_up(self, board: chess.Board) -> int:
+        """
+        A bare king against a queen or rook is a known win. It is scored on the KNOWN_WIN scale the bitbases use,
+        so promoting out of KPK does not look worse than staying in it, plus mop_up so the search finds the mate.
+        """
+        winner = self.bare_king_winner(board)
+        if winner is None:
+            return 0
+        score = KNOWN_WIN + self.mop_up(board, winner)
+        return score if winner else -score
+
+    def bare_king_winner(self, board: chess.Board):
+        """:return: the color facing a bare king with a queen or rook, None if there is none"""
+        for winner in chess.COLORS:
+            loser_pieces = board.occupied_co[not winner]
+            if loser_pieces == board.kings & loser_pieces and (board.queens | board.rooks) & board.occupied_co[winner]:
+                return winner
+        return None
+
+    def mop_up(self, board: chess.Board, winner: bool) -> int:
+        """drives the losing king to the edge, KING_END being lowest there, and brings the winning king close"""
+        loser_king = board.king(not winner)
+        distance = chess.square_distance(board.king(winner), loser_king)
+        return -self.piece_table.read(not winner, PieceTable.KING_END, loser_king) - self.MOP_UP_DISTANCE_WEIGHT * distance
+
+    def evaluate_king_safety(self, attack_map: AttackMap) -> int:
+        """penalizes each side for enemy attacks on the squares around its king"""
+        score = 0
+        for color in (True, False):
+            zone = attack_map.king_zone(color)
+            danger = 0
+            for piece_type, weight in self.KING_ATTACK_WEIGHTS.items():
+                danger += chess.popcount(attack_map.attacked_by(not color, piece_type) & zone) * weight
+            score += -danger if color else danger
+        return score
+
     def evaluate_piece_tables(self, board: chess.Board, color: bool) -> int:
         """
         evaluate all the piece tables
-        TODO: Implement game phase, endgame pawns and king, for now only doing early game
+        pawns and king blend their middle and end game tables by the game phase
         """
         score = 0
+        phase = self.game_phase(board)
 
         score += self.evaluate_piece_table(board, self.piece_table.ROOKS, chess.ROOK, color)
         score += self.evaluate_piece_table(board, self.piece_table.KNIGHTS, chess.KNIGHT, color)
@@ -49,15 +158,25 @@ class Evaluation:
         pawn_mid = self.evaluate_piece_table(board, self.piece_table.PAWNS_MID, chess.PAWN, color)
         pawn_late = self.evaluate_piece_table(board, self.piece_table.PAWNS_END, chess.PAWN, color)
 
-        score += pawn_mid # change here later
+        score += self.blend_phase(pawn_mid, pawn_late, phase)
 
         king_early = self.evaluate_piece_table(board, self.piece_table.KING_EARLY, chess.KING, color)
         king_late = self.evaluate_piece_table(board, self.piece_table.KING_END, chess.KING, color)
 
-        score += king_early # also change here
+        score += self.blend_phase(king_early, king_late, phase)
 
         return score
 
+    def game_phase(self, board: chess.Board) -> int:
+        """MAX_PHASE with all pieces on the board, down to 0 when only kings and pawns are left"""
+        phase = 0
+        for piece_type, weight in self.PHASE_WEIGHTS.items():
+            phase += chess.popcount(board.pieces_mask(piece_type, True) | board.pieces_mask(piece_type, False)) * weight
+        return min(phase, self.MAX_PHASE)
+
+    def blend_phase(self, mid: int, end: int, phase: int) -> int:
+        return (mid * phase + end * (self.MAX_PHASE - phase)) // self.MAX_PHASE
+
     def evaluate_piece_table(self, board, table, piece_type: chess.PieceType, color: bool) -> int:
         score = 0
 
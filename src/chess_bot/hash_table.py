@@ -0,0 +1,37 @@
+class HashTable:
+    """
+    Fixed-size, direct-mapped table from 64 bit keys to scores.
+    Stores always overwrite whatever sits in the slot, so there is no locking or bucket search,
+    and the full key is kept to tell a real hit from an index collision.
+    """
+
+    def __init__(self, size_bits=14):
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.keys = [None] * self.size
+        self.scores = [0] * self.size
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key: int):
+        """:return: the cached score for key, or None on a miss"""
+        self.probes += 1
+        index = key & self.mask
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[index]
+        return None
+
+    def store(self, key: int, score: int):
+        index = key & self.mask
+        self.keys[index] = key
+        self.scores[index] = score
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.scores = [0] * self.size
+        self.probes = 0
+        self.hits = 0
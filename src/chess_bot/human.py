@@ -168,5 +168,7 @@ class HumanPlayer:
 
 
 
-                self.game.display_board(mouse_pos=pygame.mouse.get_pos(), dragging=self.dragging,
-                                        selected_square=self.selected_square)
+            # Redraw every frame so analysis arrows keep updating while waiting for input
+            self.game.display_board(mouse_pos=pygame.mouse.get_pos(), dragging=self.dragging,
+                                    selected_square=self.selected_square)
+            self.game.clock.tick(config.FPS)
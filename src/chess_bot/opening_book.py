@@ -1,5 +1,4 @@
 import random
-import pygame
 
 class OpeningBook:
     def __init__(self, path):
@@ -0,0 +1,95 @@
+import chess
+import chess.polyglot
+from .attack_map import pawn_attacks
+from .hash_table import HashTable
+
+
+class PawnHashTable(HashTable):
+    """Pawn structure scores keyed by a pawn-only zobrist key"""
+
+
+class PawnStructure:
+    """Evaluates doubled, isolated, passed and backward pawns, cached in a PawnHashTable"""
+
+    DOUBLED_PENALTY = 15
+    ISOLATED_PENALTY = 15
+    BACKWARD_PENALTY = 10
+    # bonus for a passed pawn by how many ranks it has advanced
+    PASSED_BONUS = [0, 5, 10, 20, 35, 60, 100, 0]
+
+    def __init__(self, size_bits=14):
+        self.table = PawnHashTable(size_bits)
+        self._adjacent_files = [self._adjacent_files_mask(file) for file in range(8)]
+        # squares in front of a pawn on its own and adjacent files, per color and square
+        self._front_span = {color: [self._front_span_mask(color, square) for square in chess.SQUARES]
+                            for color in chess.COLORS}
+
+    @staticmethod
+    def _adjacent_files_mask(file: int) -> int:
+        mask = 0
+        if file > 0:
+            mask |= chess.BB_FILES[file - 1]
+        if file < 7:
+            mask |= chess.BB_FILES[file + 1]
+        return mask
+
+    def _front_span_mask(self, color: bool, square: chess.Square) -> int:
+        file = chess.square_file(square)
+        rank = chess.square_rank(square)
+        ranks = range(rank + 1, 8) if color else range(0, rank)
+        in_front = 0
+        for r in ranks:
+            in_front |= chess.BB_RANKS[r]
+        return in_front & (chess.BB_FILES[file] | self._adjacent_files[file])
+
+    @staticmethod
+    def pawn_key(board: chess.Board) -> int:
+        """zobrist key built from the pawns only, using the polyglot random numbers"""
+        key = 0
+        randoms = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+        # polyglot piece index: black pawn = 0, white pawn = 1
+        for square in chess.scan_forward(board.pawns & board.occupied_co[chess.BLACK]):
+            key ^= randoms[square]
+        for square in chess.scan_forward(board.pawns & board.occupied_co[chess.WHITE]):
+            key ^= randoms[64 + square]
+        return key
+
+    def evaluate(self, board: chess.Board) -> int:
+        """pawn structure score from white's point of view"""
+        key = self.pawn_key(board)
+        score = self.table.probe(key)
+        if score is None:
+            white = board.pawns & board.occupied_co[chess.WHITE]
+            black = board.pawns & board.occupied_co[chess.BLACK]
+            score = self.evaluate_side(white, black, chess.WHITE) - self.evaluate_side(black, white, chess.BLACK)
+            self.table.store(key, score)
+        return score
+
+    def evaluate_side(self, own: int, enemy: int, color: bool) -> int:
+        score = 0
+        enemy_attacks = pawn_attacks(enemy, not color)
+
+        for file in range(8):
+            count = chess.popcount(own & chess.BB_FILES[file])
+            if count > 1:
+                score -= self.DOUBLED_PENALTY * (count - 1)
+
+        for square in chess.scan_forward(own):
+            file = chess.square_file(square)
+            rank = chess.square_rank(square)
+            neighbours = own & self._adjacent_files[file]
+
+            if not enemy & self._front_span[color][square]:
+                score += self.PASSED_BONUS[rank if color else 7 - rank]
+
+            if not neighbours:
+                score -= self.ISOLATED_PENALTY
+                continue
+
+            # backward: every neighbour is already ahead of it and the stop square is covered by an enemy pawn
+            stop = square + 8 if color else square - 8
+            if 0 <= stop < 64 and not neighbours & ~self._front_span[color][square] \
+                    and enemy_attacks & chess.BB_SQUARES[stop]:
+                score -= self.BACKWARD_PENALTY
+
+        return score
@@ -0,0 +1,156 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import chess
+import chess.polyglot
+from .chess_board import ChessBoard
+from .hash_table import HashTable
+
+# (name, fen, expected node counts for depth 1, 2, ...), from the chess programming wiki perft results
+REFERENCE_POSITIONS = [
+    ("start", chess.STARTING_FEN,
+     [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+
+class PerftTable(HashTable):
+    """Subtree node counts keyed by position zobrist hash and remaining depth"""
+
+    DEPTH_BITS = 6
+    # hashing a position costs about as much as bulk counting a depth 2 subtree, so only deeper ones are cached
+    MIN_DEPTH = 3
+
+    def key(self, board: chess.Board, depth: int) -> int:
+        return chess.polyglot.zobrist_hash(board) << self.DEPTH_BITS | depth
+
+
+def _to_board(board) -> chess.Board:
+    if isinstance(board, ChessBoard):
+        return board.get_board_state().copy()
+    if isinstance(board, str):
+        return chess.Board(board)
+    return board.copy()
+
+
+def perft(board: chess.Board, depth: int, table: PerftTable = None) -> int:
+    """
+    Counts the leaf nodes of the legal move tree of board to depth.
+    Works on anything with the chess.Board legal_moves/push/pop interface.
+    :param table: optional PerftTable, subtrees of PerftTable.MIN_DEPTH and up are looked up and stored in it
+    """
+    if depth == 0:
+        return 1
+    if depth == 1:
+        # bulk counting, the leaves themselves are never pushed
+        return board.legal_moves.count()
+
+    if table is not None and depth < table.MIN_DEPTH:
+        table = None
+    if table is not None:
+        key = table.key(board, depth)
+        nodes = table.probe(key)
+        if nodes is not None:
+            return nodes
+
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += perft(board, depth - 1, table)
+        board.pop()
+
+    if table is not None:
+        table.store(key, nodes)
+    return nodes
+
+
+# the table of a worker process, kept between root moves
+_table = None
+
+
+def _init_worker(table_bits):
+    global _table
+    _table = PerftTable(table_bits) if table_bits else None
+
+
+def _perft_move(task) -> int:
+    fen, move, depth = task
+    board = chess.Board(fen)
+    board.push(chess.Move.from_uci(move))
+    return perft(board, depth - 1, _table)
+
+
+def divide(board, depth: int, workers=None, table_bits=20) -> dict:
+    """
+    Perft of every root move, the root moves are split across a process pool.
+    :param board: ChessBoard, chess.Board or fen
+    :param table_bits: log2 of the per worker PerftTable size, 0 to search without a table
+    :return: {move uci: node count}
+    """
+    board = _to_board(board)
+    if depth < 1:
+        return {}
+    moves = [move.uci() for move in board.legal_moves]
+    fen = board.fen()
+    tasks = [(fen, move, depth) for move in moves]
+
+    if workers == 1:
+        _init_worker(table_bits)
+        counts = [_perft_move(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(table_bits,)) as pool:
+            counts = list(pool.map(_perft_move, tasks))
+    return dict(zip(moves, counts))
+
+
+def run_reference_suite(max_depth=3, workers=None, table_bits=20, max_nodes=None) -> bool:
+    """
+    Runs divide on every reference position up to max_depth and compares against the expected counts.
+    :param max_nodes: skip depths whose expected count is above this
+    :return: True if every count matched
+    """
+    all_passed = True
+    for name, fen, expected in REFERENCE_POSITIONS:
+        for depth, expected_nodes in enumerate(expected[:max_depth], 1):
+            if max_nodes is not None and expected_nodes > max_nodes:
+                break
+            start_time = time.time()
+            nodes = sum(divide(fen, depth, workers, table_bits).values())
+            time_taken = time.time() - start_time
+            passed = nodes == expected_nodes
+            all_passed = all_passed and passed
+            print(f"{'ok  ' if passed else 'FAIL'} {name} depth {depth}: {nodes} nodes "
+                  f"(expected {expected_nodes}), {time_taken:.3f}s, {nodes / time_taken if time_taken else 0:.0f} nps")
+    return all_passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="perft and divide for move generator validation and benchmarking")
+    parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--table-bits", type=int, default=20, help="log2 of the hash table size, 0 for none")
+    parser.add_argument("--suite", action="store_true", help="run the reference positions up to --depth")
+    args = parser.parse_args()
+
+    if args.suite:
+        raise SystemExit(0 if run_reference_suite(args.depth, args.workers, args.table_bits) else 1)
+
+    start_time = time.time()
+    counts = divide(args.fen, args.depth, args.workers, args.table_bits)
+    time_taken = time.time() - start_time
+    for move, nodes in counts.items():
+        print(f"{move}: {nodes}")
+    total = sum(counts.values())
+    print(f"\nNodes: {total}, time: {time_taken:.3f}s, NPS: {total / time_taken if time_taken else 0:.0f}")
@@ -1,3 +1,6 @@
+import json
+
+
 class PieceTable:
     """Stores and manages piece tables for evaluation"""
 
@@ -10,7 +13,22 @@ class PieceTable:
     KING_EARLY = 6
     KING_END = 7
 
-    def __init__(self):
+    TABLE_NAMES = {
+        PAWNS_MID: "PAWNS_MID",
+        PAWNS_END: "PAWNS_END",
+        KNIGHTS: "KNIGHTS",
+        BISHOPS: "BISHOPS",
+        ROOKS: "ROOKS",
+        QUEENS: "QUEENS",
+        KING_EARLY: "KING_EARLY",
+        KING_END: "KING_END",
+    }
+
+    def __init__(self, path=None):
+        """
+        :param path: optional json file written by save, e.g. by the tuner. Tables missing from it keep
+        their built in values, and piece values found in it are kept in self.piece_values
+        """
         self.tables = {
             False: {
                 self.PAWNS_MID: self._pawns_mid(),
@@ -23,12 +41,35 @@ class PieceTable:
                 self.KING_END: self._king_end(),
             }
         }
+        self.piece_values = None
+        if path:
+            self.load(path)
         self.tables[True] = self._invert_tables(self.tables[False])
         # False = white, True = black
 
     def read(self, color: bool, table, square):
         return self.tables[color][table][square]
 
+    def load(self, path):
+        with open(path, 'r') as file:
+            data = json.load(file)
+        for table, name in self.TABLE_NAMES.items():
+            if name in data.get("tables", {}):
+                values = [int(value) for value in data["tables"][name]]
+                if len(values) != 64:
+                    raise ValueError(f"table {name} in {path} has {len(values)} entries, expected 64")
+                self.tables[False][table] = values
+        if "piece_values" in data:
+            self.piece_values = {int(piece): int(value) for piece, value in data["piece_values"].items()}
+
+    def save(self, path, piece_values=None):
+        """writes the tables in the layout they are written in here, the same one load reads"""
+        data = {"tables": {name: self.tables[False][table] for table, name in self.TABLE_NAMES.items()}}
+        if piece_values:
+            data["piece_values"] = {str(piece): value for piece, value in piece_values.items()}
+        with open(path, 'w') as file:
+            json.dump(data, file, indent=1)
+
     @staticmethod
     def _invert_tables(white_tables):
         return {piece: list(reversed(table)) for piece, table in white_tables.items()}
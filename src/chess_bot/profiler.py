@@ -0,0 +1,147 @@
+import argparse
+import cProfile
+import functools
+import pstats
+import time
+from collections import defaultdict
+import chess
+
+
+class SearchProfiler:
+    """
+    Region timers for the phases of a search. Regions nest, and time is charged to the innermost
+    open region only, so e.g. move generation inside evaluate_position does not count as evaluation.
+    Nothing is timed until a ChessBot is switched over with enable_profiling, so a normal search
+    pays nothing for this.
+    """
+
+    def __init__(self):
+        self.self_time = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.stacks = defaultdict(float)  # (outer region, ..., inner region) -> seconds, for flamegraphs
+        self._stack = []
+        self._resumed = 0.0
+
+    def enter(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            self._charge(now)
+        self._stack.append(name)
+        self.calls[name] += 1
+        self._resumed = now
+
+    def exit(self):
+        now = time.perf_counter()
+        self._charge(now)
+        self._stack.pop()
+        self._resumed = now
+
+    def _charge(self, now: float):
+        elapsed = now - self._resumed
+        self.self_time[self._stack[-1]] += elapsed
+        self.stacks[tuple(self._stack)] += elapsed
+
+    def timed(self, name: str, function):
+        """wraps function so every call is timed as region name"""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapper
+
+    def timed_generator(self, name: str, function):
+        """wraps a generator function so the time spent producing each item is timed as region name"""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            iterator = function(*args, **kwargs)
+            while True:
+                self.enter(name)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.exit()
+                yield item
+        return wrapper
+
+    def instrument_board(self, board: chess.Board) -> chess.Board:
+        """:return: a copy of board whose push/pop and legal move generation are timed"""
+        board = board.copy()
+        board.push = self.timed("push/pop", board.push)
+        board.pop = self.timed("push/pop", board.pop)
+        board.generate_legal_moves = self.timed_generator("move generation", board.generate_legal_moves)
+        return board
+
+    def reset(self):
+        self.self_time.clear()
+        self.calls.clear()
+        self.stacks.clear()
+        self._stack.clear()
+
+    def report(self) -> str:
+        total = sum(self.self_time.values())
+        lines = [f"{'phase':<20}{'seconds':>10}{'share':>8}{'calls':>10}"]
+        for name, seconds in sorted(self.self_time.items(), key=lambda item: item[1], reverse=True):
+            share = seconds / total if total else 0
+            lines.append(f"{name:<20}{seconds:>10.4f}{share:>8.1%}{self.calls[name]:>10}")
+        return "\n".join(lines)
+
+    def write_collapsed(self, path):
+        """collapsed stack lines ('search;evaluation;move generation 1234', in microseconds) for flamegraph.pl"""
+        with open(path, 'w') as file:
+            for stack, seconds in sorted(self.stacks.items()):
+                file.write(f"{';'.join(stack)} {int(seconds * 1e6)}\n")
+
+
+def profile_search(bot, board: chess.Board, depth: int, cprofile_path=None, collapsed_path=None):
+    """
+    Searches board to depth once with the region timers and prints the phase breakdown,
+    then, if cprofile_path is given, once more under cProfile, which is too heavy to share a run with them.
+    Both runs start from empty tables and caches, so the second does not just read back the first.
+    :return: the SearchProfiler of the first run
+    """
+    profiler = bot.enable_profiling()
+    try:
+        bot.clear_search_state()
+        profiled_board = profiler.instrument_board(board)
+        profiler.enter("search")
+        try:
+            bot.minimax(profiled_board, depth, -float('inf'), float('inf'), board.turn)
+        finally:
+            profiler.exit()
+    finally:
+        bot.disable_profiling()
+
+    print(profiler.report())
+    if collapsed_path:
+        profiler.write_collapsed(collapsed_path)
+        print(f"Collapsed stacks written to {collapsed_path}")
+
+    if cprofile_path:
+        bot.clear_search_state()
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+        bot.minimax(board.copy(), depth, -float('inf'), float('inf'), board.turn)
+        cprofiler.disable()
+        cprofiler.dump_stats(cprofile_path)
+        print(f"cProfile stats written to {cprofile_path}")
+        pstats.Stats(cprofiler).sort_stats("cumulative").print_stats(15)
+
+    return profiler
+
+
+if __name__ == "__main__":
+    from .bot import ChessBot
+
+    parser = argparse.ArgumentParser(description="Break the search time of a position down by phase")
+    parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--cprofile", default=None, help="write cProfile stats to this file")
+    parser.add_argument("--collapsed", default=None, help="write collapsed stacks for flamegraphs to this file")
+    args = parser.parse_args()
+
+    profile_search(ChessBot(), chess.Board(args.fen), args.depth, args.cprofile, args.collapsed)
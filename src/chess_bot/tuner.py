@@ -0,0 +1,266 @@
+import argparse
+import glob
+import os
+import tempfile
+import time
+import chess
+import chess.pgn
+import numpy as np
+from .evaluation import Evaluation
+from .piece_table import PieceTable
+from .batch_evaluation import PLANES, board_to_bitboards
+
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+
+def read_pgn_positions(path, skip_plies=8):
+    """
+    Yields (board, result) for every mainline position of every finished game in a pgn file.
+    The first skip_plies positions are book moves and positions in check are not quiet, so both are skipped.
+    """
+    with open(path, 'r') as file:
+        while True:
+            game = chess.pgn.read_game(file)
+            if game is None:
+                break
+            result = RESULTS.get(game.headers.get("Result"))
+            if result is None:
+                continue
+            board = game.board()
+            for ply, move in enumerate(game.mainline_moves()):
+                board.push(move)
+                if ply + 1 >= skip_plies and not board.is_check():
+                    yield board, result
+
+
+def read_epd_positions(path):
+    """
+    Yields (board, result) from an epd file with the game result in the c9 opcode,
+    e.g. 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - c9 "1/2-1/2";'
+    This is also the format self-play games are logged in for tuning.
+    """
+    with open(path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            board, ops = chess.Board.from_epd(line)
+            result = RESULTS.get(ops.get("c9"))
+            if result is not None:
+                yield board, result
+
+
+def read_positions(paths, skip_plies=8):
+    for path in paths:
+        if path.endswith(".pgn"):
+            yield from read_pgn_positions(path, skip_plies)
+        else:
+            yield from read_epd_positions(path)
+
+
+class Tuner:
+    """
+    Texel tuning of the piece values and piece tables.
+
+    The model is the function the engine evaluates with: material from white's point of view plus the
+    piece tables of the evaluated color only, which in the search is the side to move, with the pawn and
+    king tables blended by game phase like evaluate_piece_tables. Every parameter enters linearly, so a
+    position is a sparse feature vector (at most 32 pieces, two entries for pawns and kings) and the
+    sigmoid-of-eval loss is minimized with mini-batch Adam.
+
+    Features are extracted once into batch files in work_dir, so memory stays at one batch
+    however many positions there are.
+    """
+
+    # parameter layout: piece values of pawn .. queen, then 64 entries per piece table
+    TABLES_OFFSET = 5
+
+    def __init__(self, evaluation: Evaluation = None, k=1.0, batch_size=16384, learning_rate=1.0, work_dir=None):
+        self.evaluation = evaluation or Evaluation()
+        self.k = k  # scales centipawns into the sigmoid, 1 means 400 centipawns is 10:1 odds
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        if work_dir is None:
+            self._temp_dir = tempfile.TemporaryDirectory(prefix="tuner_")
+            work_dir = self._temp_dir.name
+        self.work_dir = work_dir
+        self.batch_files = []
+        self.parameters = self.initial_parameters()
+
+        pt = self.evaluation.piece_table
+        # piece table of each piece type, pawn and king have a middle and an end game table
+        self._mid_tables = np.array([0, pt.PAWNS_MID, pt.KNIGHTS, pt.BISHOPS, pt.ROOKS, pt.QUEENS, pt.KING_EARLY])
+        self._end_tables = np.array([0, pt.PAWNS_END, -1, -1, -1, -1, pt.KING_END])
+        self._phase_weights = np.array(
+            [self.evaluation.PHASE_WEIGHTS.get(piece_type, 0) for _, piece_type in PLANES], dtype=np.float64)
+
+    def initial_parameters(self) -> np.ndarray:
+        values = [self.evaluation.piece_values[piece_type] for piece_type in range(chess.PAWN, chess.KING)]
+        tables = self.evaluation.piece_table.tables[False]
+        return np.array(values + [value for table in sorted(tables) for value in tables[table]], dtype=np.float64)
+
+    def extract_features(self, bitboards: np.ndarray, colors: np.ndarray):
+        """
+        :param bitboards: (N, 12) uint64 piece bitboards in PLANES order
+        :param colors: (N,) the color evaluate_piece_tables scores for each position
+        :return: (rows, cols, values) of the sparse (N, parameters) feature matrix
+        """
+        count = len(bitboards)
+        as_bytes = np.ascontiguousarray(bitboards, dtype='<u8').view(np.uint8).reshape(count, len(PLANES), 8)
+        squares = np.unpackbits(as_bytes, axis=2, bitorder='little')
+        counts = squares.sum(axis=2)
+        phase = np.minimum(counts @ self._phase_weights, self.evaluation.MAX_PHASE) / self.evaluation.MAX_PHASE
+
+        position, plane, square = np.nonzero(squares)
+        white = plane < 6
+        piece_type = plane % 6 + 1
+        sign = np.where(white, 1.0, -1.0)
+
+        # material, the king value cancels out and is not tuned
+        is_material = piece_type != chess.KING
+        rows = [position[is_material]]
+        cols = [piece_type[is_material] - 1]
+        values = [sign[is_material]]
+
+        # piece tables, only the evaluated color's pieces count and they always count positive
+        scored = white == np.asarray(colors, dtype=bool)[position]
+        position, square, piece_type, white = position[scored], square[scored], piece_type[scored], white[scored]
+        # white reads the tables mirrored, see PieceTable.read
+        index = np.where(white, 63 - square, square)
+
+        blended = (piece_type == chess.PAWN) | (piece_type == chess.KING)
+        mid_weight = np.where(blended, phase[position], 1.0)
+        rows.append(position)
+        cols.append(self.TABLES_OFFSET + self._mid_tables[piece_type] * 64 + index)
+        values.append(mid_weight)
+
+        rows.append(position[blended])
+        cols.append(self.TABLES_OFFSET + self._end_tables[piece_type[blended]] * 64 + index[blended])
+        values.append(1.0 - phase[position[blended]])
+
+        return (np.concatenate(rows).astype(np.int32), np.concatenate(cols).astype(np.int32),
+                np.concatenate(values).astype(np.float32))
+
+    def _write_batch(self, bitboards, colors, results):
+        rows, cols, values = self.extract_features(np.array(bitboards, dtype=np.uint64), np.array(colors, dtype=bool))
+        path = os.path.join(self.work_dir, f"batch_{len(self.batch_files):06d}.npz")
+        np.savez(path, rows=rows, cols=cols, values=values, results=np.array(results, dtype=np.float32))
+        self.batch_files.append(path)
+
+    def extract(self, positions) -> int:
+        """
+        :param positions: iterable of (chess.Board, result) with result 1, 0.5 or 0 for white
+        :return: number of positions extracted
+        """
+        start_time = time.time()
+        bitboards, colors, results = [], [], []
+        total = 0
+        for board, result in positions:
+            bitboards.append(board_to_bitboards(board))
+            # the search evaluates every node for its side to move
+            colors.append(board.turn)
+            results.append(result)
+            if len(bitboards) == self.batch_size:
+                self._write_batch(bitboards, colors, results)
+                total += len(bitboards)
+                bitboards, colors, results = [], [], []
+        if bitboards:
+            self._write_batch(bitboards, colors, results)
+            total += len(bitboards)
+
+        time_taken = time.time() - start_time
+        print(f"Extracted {total} positions in {len(self.batch_files)} batches, "
+              f"{total / time_taken if time_taken else 0:.0f} positions/s")
+        return total
+
+    def _sigmoid(self, evals: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.power(10.0, -self.k * evals / 400.0))
+
+    def _batch_gradient(self, batch):
+        rows, cols, values, results = batch["rows"], batch["cols"], batch["values"], batch["results"]
+        count = len(results)
+        evals = np.bincount(rows, weights=values * self.parameters[cols], minlength=count)
+        predicted = self._sigmoid(evals)
+        error = predicted - results
+        loss = np.mean(error ** 2)
+        # d loss / d eval for every position
+        d_eval = 2.0 * error * predicted * (1.0 - predicted) * np.log(10.0) * self.k / 400.0 / count
+        gradient = np.bincount(cols, weights=values * d_eval[rows], minlength=len(self.parameters))
+        return loss, gradient
+
+    def loss(self) -> float:
+        total, count = 0.0, 0
+        for path in self.batch_files:
+            with np.load(path) as batch:
+                batch_loss, _ = self._batch_gradient(batch)
+                total += batch_loss * len(batch["results"])
+                count += len(batch["results"])
+        return total / count if count else 0.0
+
+    def fit(self, epochs=10, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        """mini-batch Adam over the extracted batches"""
+        m = np.zeros_like(self.parameters)
+        v = np.zeros_like(self.parameters)
+        step = 0
+        for epoch in range(epochs):
+            start_time = time.time()
+            total_loss, count = 0.0, 0
+            for path in self.batch_files:
+                with np.load(path) as batch:
+                    loss, gradient = self._batch_gradient(batch)
+                    batch_count = len(batch["results"])
+                step += 1
+                m = beta1 * m + (1 - beta1) * gradient
+                v = beta2 * v + (1 - beta2) * gradient ** 2
+                m_hat = m / (1 - beta1 ** step)
+                v_hat = v / (1 - beta2 ** step)
+                self.parameters -= self.learning_rate * m_hat / (np.sqrt(v_hat) + epsilon)
+                total_loss += loss * batch_count
+                count += batch_count
+
+            time_taken = time.time() - start_time
+            print(f"Epoch {epoch + 1}/{epochs}: loss {total_loss / count if count else 0:.6f}, "
+                  f"{count / time_taken if time_taken else 0:.0f} positions/s")
+
+    def piece_table(self) -> PieceTable:
+        """a PieceTable holding the tuned tables, rounded to whole centipawns"""
+        piece_table = PieceTable()
+        rounded = np.rint(self.parameters).astype(int).tolist()
+        for table in piece_table.tables[False]:
+            start = self.TABLES_OFFSET + table * 64
+            piece_table.tables[False][table] = rounded[start:start + 64]
+        piece_table.tables[True] = piece_table._invert_tables(piece_table.tables[False])
+        return piece_table
+
+    def piece_values(self) -> dict:
+        values = dict(self.evaluation.piece_values)
+        for piece_type in range(chess.PAWN, chess.KING):
+            values[piece_type] = int(np.rint(self.parameters[piece_type - 1]))
+        return values
+
+    def save(self, path):
+        """writes the tuned weights in the format Evaluation(weights_path=...) loads"""
+        self.piece_table().save(path, self.piece_values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Texel tuning of the piece values and piece tables")
+    parser.add_argument("inputs", nargs="+", help="pgn files or epd files with c9 results, globs allowed")
+    parser.add_argument("--output", default="tuned_weights.json")
+    parser.add_argument("--weights", default=None, help="weights to start from instead of the built in ones")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16384)
+    parser.add_argument("--learning-rate", type=float, default=1.0)
+    parser.add_argument("--k", type=float, default=1.0)
+    parser.add_argument("--skip-plies", type=int, default=8)
+    parser.add_argument("--work-dir", default=None, help="where feature batches are kept, a temp dir by default")
+    args = parser.parse_args()
+
+    paths = [path for pattern in args.inputs for path in sorted(glob.glob(pattern))]
+    tuner = Tuner(Evaluation(weights_path=args.weights), k=args.k, batch_size=args.batch_size,
+                  learning_rate=args.learning_rate, work_dir=args.work_dir)
+    tuner.extract(read_positions(paths, args.skip_plies))
+    print(f"Initial loss: {tuner.loss():.6f}")
+    tuner.fit(args.epochs)
+    tuner.save(args.output)
+    print(f"Saved tuned weights to {args.output}")
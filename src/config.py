@@ -1 +1,2 @@
-BOARD_SIZE = 800
\ No newline at end of file
+BOARD_SIZE = 800
+FPS = 60
\ No newline at end of file
@@ -3,9 +3,11 @@ import chess.svg
 from chess_bot import ChessBoard
 from chess_bot import ChessBot
 from chess_bot.human import HumanPlayer
+from chess_bot.analysis_engine import AnalysisEngine
 from ui import BoardRenderer
 import pygame
 import os
+from concurrent.futures import ThreadPoolExecutor
 import config
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
@@ -13,9 +15,10 @@ ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
 
 IS_BOT = False  # Set to False for human vs bot, True for bot vs bot
+ANALYSIS_MODE = False  # Set to True to draw the engine's live top moves as arrows
 
 class ChessGame:
-    def __init__(self, fen = None):
+    def __init__(self, fen = None, analysis = ANALYSIS_MODE):
         self.board = ChessBoard() if not fen else ChessBoard(fen)
         self.WINDOW_SIZE = config.BOARD_SIZE
         self.spritesheet = pygame.image.load(f"{ASSETS_DIR}/spritesheet.png")
@@ -30,8 +33,19 @@ class ChessGame:
             self.white_player = HumanPlayer(chess.WHITE, self, self.board_renderer)
             self.black_player = ChessBot()
         
+        # Bot moves are searched on this thread while the main thread keeps drawing
+        self.bot_executor = ThreadPoolExecutor(max_workers=1)
+
+        # Start the analysis engine before pygame so its process does not inherit a display
+        self.analysis_engine = None
+        if analysis:
+            self.analysis_engine = AnalysisEngine(lines=3)
+            self.analysis_engine.start()
+            self.analysis_engine.set_position(self.board.get_board_state().fen())
+
         # Initialize Pygame
         pygame.init()
+        self.clock = pygame.time.Clock()
         pygame.mixer.init()
         self.move_sound = pygame.mixer.Sound(f"{ASSETS_DIR}/move-self.mp3")
         self.capture_sound = pygame.mixer.Sound(f"{ASSETS_DIR}/capture.mp3")
@@ -61,6 +75,10 @@ class ChessGame:
         self.board_renderer.draw_board(self.screen)
         self.board_renderer.draw_pieces(self.screen, selected_square, fill=highlight_squares)
 
+        if self.analysis_engine is not None:
+            self.board_renderer.draw_analysis_arrows(self.screen, self.analysis_engine.poll(),
+                                                     self.board.get_board_state().turn)
+
         if dragging:
             self.board_renderer.draw_drag(self.screen, mouse_pos, selected_piece)
 
@@ -68,6 +86,27 @@ class ChessGame:
 
         pygame.display.flip()
 
+    def get_bot_move(self, bot, last_move=None):
+        """
+        Runs the bot's search off the UI thread and keeps drawing frames until it has a move.
+        The bot gets its own copy of the board, so the renderer never sees it mid search.
+        :return: the bot's move, or None if the window was closed meanwhile
+        """
+        search_board = ChessBoard()
+        search_board.board = self.board.get_board_state().copy()
+        future = self.bot_executor.submit(bot.get_move, search_board)
+
+        while not future.done():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    # makes minimax raise SearchAborted, ending the worker thread
+                    bot.stop_requested = lambda: True
+                    return None
+            self.display_board(last_move)
+            self.clock.tick(config.FPS)
+
+        return future.result()
+
     def play_move_sound(self, move):
         """plays move sound"""
         if self.board.board.is_capture(move):
@@ -96,7 +135,10 @@ class ChessGame:
             current_player = self.white_player if self.board.get_board_state().turn else self.black_player
 
             # Get player's move
-            move = current_player.get_move(self.board)
+            if isinstance(current_player, ChessBot):
+                move = self.get_bot_move(current_player, last_move)
+            else:
+                move = current_player.get_move(self.board)
 
             if move is None:
                 print("Game ended by player")
@@ -112,6 +154,9 @@ class ChessGame:
             print(f"Move played: {move}")
             last_move = move
 
+            if self.analysis_engine is not None:
+                self.analysis_engine.set_position(self.board.get_board_state().fen())
+
             # Add delay only for bot moves
             if isinstance(current_player, ChessBot):
                 pygame.time.wait(100)  # .1 second delay
@@ -127,6 +172,9 @@ class ChessGame:
             if event.type == pygame.QUIT:
                 break
 
+        if self.analysis_engine is not None:
+            self.analysis_engine.stop()
+        self.bot_executor.shutdown(wait=True)
         pygame.quit()
 
 
@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+import chess
+from chess_bot import ChessBoard
+from chess_bot import ChessBot
+
+_bot = None
+
+
+def _init_worker(weights_path=None):
+    """pool initializer, one engine per process serves the moves of every game"""
+    global _bot
+    _bot = ChessBot(weights_path=weights_path)
+
+
+def _bot_move(fen: str, time_limit: float, max_depth) -> tuple:
+    """
+    Runs in a worker process.
+    :return: (move uci, seconds spent)
+    """
+    start_time = time.time()
+    # the book is keyed on the first four fen fields, checked first so get_move does not print misses
+    book_fen = ' '.join(fen.split(' ')[:4])
+    if _bot.opening_book.has_move(book_fen):
+        return _bot.opening_book.get_move(fen), time.time() - start_time
+
+    _bot.transposition_table.clear()
+    _, move, _, _ = _bot.search(chess.Board(fen), depth=max_depth, time_limit=time_limit)
+    return move.uci(), time.time() - start_time
+
+
+class TimeControl:
+    """Chess clock for one side, initial seconds plus an increment per move"""
+
+    def __init__(self, initial=300.0, increment=0.0):
+        self.remaining = initial
+        self.increment = increment
+
+    def spend(self, seconds: float) -> bool:
+        """:return: False when the flag fell"""
+        self.remaining -= seconds
+        if self.remaining <= 0:
+            self.remaining = 0.0
+            return False
+        self.remaining += self.increment
+        return True
+
+    def move_budget(self) -> float:
+        """thinking time for the bot's next move, assuming about 30 moves still to play"""
+        return max(0.05, min(self.remaining / 30 + self.increment * 0.8, self.remaining / 2))
+
+
+class GameSession:
+    """One human vs bot game"""
+
+    def __init__(self, human_color: bool, time_control: dict, max_depth=None):
+        self.id = uuid.uuid4().hex
+        self.board = ChessBoard()
+        self.human_color = human_color
+        self.max_depth = max_depth
+        self.clocks = {color: TimeControl(**time_control) for color in chess.COLORS}
+        self.turn_started = time.time()
+        self.result = None
+        self.lock = asyncio.Lock()  # one move at a time per game
+
+    def state(self) -> dict:
+        board = self.board.get_board_state()
+        return {
+            "game_id": self.id,
+            "fen": board.fen(),
+            "human_color": "white" if self.human_color else "black",
+            "clocks": {"white": round(self.clocks[chess.WHITE].remaining, 3),
+                       "black": round(self.clocks[chess.BLACK].remaining, 3)},
+            "last_move": board.peek().uci() if board.move_stack else None,
+            "result": self.result,
+        }
+
+    def flag(self, color: bool):
+        self.result = "0-1" if color else "1-0"
+
+    def check_game_over(self):
+        if self.result is None and self.board.is_game_over():
+            self.result = self.board.get_board_state().result()
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _seconds(body: dict, name: str, default: float) -> float:
+    value = body.get(name, default)
+    # bools are ints to python, but true is no time control
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value < float('inf'):
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} must be a number of seconds")
+    return float(value)
+
+
+class GameServer:
+    """
+    Hosts many human vs bot games over a small json http interface:
+        POST   /games                 {"color": "white", "initial": 300, "increment": 2, "max_depth": null}
+        GET    /games/<id>
+        POST   /games/<id>/move       {"move": "e2e4"}, answers once the bot has replied
+        DELETE /games/<id>
+
+    Bot moves go through one fifo queue to a fixed number of dispatchers, one per worker process,
+    so requests are served in arrival order and a game never has more than one move waiting.
+    When max_queue moves are already waiting, new ones are refused with 503, and a move the engine
+    fails on is answered with 500. Either way the human's move is taken back and their clock restored,
+    so the game is left as it was and the move can be retried.
+    """
+
+    def __init__(self, workers=None, max_queue=1000, weights_path=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.sessions = {}
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(weights_path,))
+        self.dispatchers = []
+        self.moves_served = 0
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self.dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def close(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.dispatchers = []
+        # a search still running in a worker finishes on its own, the event loop does not wait for it
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            session, future = await self.queue.get()
+            try:
+                board = session.board.get_board_state()
+                clock = session.clocks[board.turn]
+                result = await loop.run_in_executor(self.pool, _bot_move, board.fen(),
+                                                    clock.move_budget(), session.max_depth)
+                future.set_result(result)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            finally:
+                self.queue.task_done()
+
+    async def request_bot_move(self, session: GameSession):
+        """
+        Queues the bot's reply and plays it once a worker has found it.
+        Raises HttpError without touching the game if the move could not be queued or the engine failed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((session, future))
+        except asyncio.QueueFull:
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "engine queue is full, try again later")
+        try:
+            move, seconds = await future
+        except Exception as error:
+            raise HttpError(HTTPStatus.INTERNAL_SERVER_ERROR, f"engine failed: {error!r}")
+
+        board = session.board.get_board_state()
+        if not session.clocks[board.turn].spend(seconds):
+            session.flag(board.turn)
+            return
+        session.board.make_move(chess.Move.from_uci(move))
+        self.moves_served += 1
+        session.turn_started = time.time()
+        session.check_game_over()
+
+    # -- request handlers --
+
+    async def create_game(self, body: dict) -> dict:
+        color = body.get("color", "white")
+        if color not in ("white", "black"):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "color must be white or black")
+        time_control = {"initial": _seconds(body, "initial", 300), "increment": _seconds(body, "increment", 0)}
+        if time_control["initial"] <= 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "initial must be above 0")
+        max_depth = body.get("max_depth")
+        if max_depth is not None and (isinstance(max_depth, bool) or not isinstance(max_depth, int) or max_depth < 1):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "max_depth must be a positive integer or null")
+        human_color = color == "white"
+        session = GameSession(human_color, time_control, max_depth)
+        if not human_color:
+            async with session.lock:
+                await self.request_bot_move(session)
+        self.sessions[session.id] = session
+        session.turn_started = time.time()
+        return session.state()
+
+    async def play_move(self, session: GameSession, body: dict) -> dict:
+        async with session.lock:
+            board = session.board.get_board_state()
+            if session.result is not None:
+                raise HttpError(HTTPStatus.CONFLICT, "game is over")
+            if board.turn != session.human_color:
+                raise HttpError(HTTPStatus.CONFLICT, "not your turn")
+            uci = body.get("move")
+            if not isinstance(uci, str):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "move must be a string in uci notation")
+            try:
+                move = chess.Move.from_uci(uci)
+            except ValueError:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "move must be in uci notation")
+
+            if move not in board.legal_moves:
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"illegal move {move.uci()}")
+
+            clock = session.clocks[board.turn]
+            remaining = clock.remaining
+            if not clock.spend(time.time() - session.turn_started):
+                session.flag(board.turn)
+                return session.state()
+            session.board.make_move(move)
+
+            session.check_game_over()
+            if session.result is None:
+                try:
+                    await self.request_bot_move(session)
+                except HttpError:
+                    # take the move back so the human can retry it
+                    board.pop()
+                    clock.remaining = remaining
+                    raise
+            return session.state()
+
+    async def route(self, method: str, path: str, body: dict):
+        if not isinstance(body, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "body must be a json object")
+        parts = [part for part in path.split("/") if part]
+        if parts == ["games"] and method == "POST":
+            return HTTPStatus.CREATED, await self.create_game(body)
+        if not parts or parts[0] != "games" or len(parts) < 2:
+            raise HttpError(HTTPStatus.NOT_FOUND, "unknown path")
+
+        session = self.sessions.get(parts[1])
+        if session is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, "unknown game")
+        if len(parts) == 2 and method == "GET":
+            return HTTPStatus.OK, session.state()
+        if len(parts) == 2 and method == "DELETE":
+            del self.sessions[session.id]
+            return HTTPStatus.OK, {"game_id": session.id}
+        if len(parts) == 3 and parts[2] == "move" and method == "POST":
+            return HTTPStatus.OK, await self.play_move(session, body)
+        raise HttpError(HTTPStatus.NOT_FOUND, "unknown path")
+
+    async def _handle_connection(self, reader, writer):
+        """serves http/1.1 requests on one connection, keeping it open between them"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                raw_body = await reader.readexactly(length) if length else b""
+
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                    status, response = await self.route(method, path, body)
+                except HttpError as error:
+                    status, response = error.status, {"error": error.message}
+                except json.JSONDecodeError:
+                    status, response = HTTPStatus.BAD_REQUEST, {"error": "body must be json"}
+                except Exception as error:
+                    status, response = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(error)}
+
+                payload = json.dumps(response).encode()
+                writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, workers, max_queue, weights_path):
+    server = GameServer(workers, max_queue, weights_path)
+    listener = await server.start(host, port)
+    print(f"Serving games on http://{host}:{port} with {server.workers} engine workers")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host human vs bot games over http")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-queue", type=int, default=1000)
+    parser.add_argument("--weights", default=None, help="tuned weights json, see PieceTable.load")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.workers, args.max_queue, args.weights))
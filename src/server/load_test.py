@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import chess
+
+
+class GameClient:
+    """json over one keep-alive http/1.1 connection to a GameServer"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, path: str, body: dict = None) -> tuple:
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+                          + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).decode().split(" ")[1])
+        length = 0
+        while True:
+            line = (await self.reader.readline()).decode().strip()
+            if not line:
+                break
+            name, value = line.split(":", 1)
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_game(host, port, moves_per_game, time_control, max_depth, latencies, errors):
+    """plays random legal moves against the bot, recording the latency of every move request"""
+    client = GameClient(host, port)
+    await client.connect()
+    try:
+        status, state = await client.request("POST", "/games", dict(time_control, color="white", max_depth=max_depth))
+        if status != 201:
+            errors.append(state.get("error", status))
+            return
+        game_id = state["game_id"]
+
+        for _ in range(moves_per_game):
+            if state["result"] is not None:
+                break
+            board = chess.Board(state["fen"])
+            move = random.choice(list(board.legal_moves))
+
+            start_time = time.perf_counter()
+            status, state = await client.request("POST", f"/games/{game_id}/move", {"move": move.uci()})
+            latencies.append(time.perf_counter() - start_time)
+            if status != 200:
+                errors.append(state.get("error", status))
+                break
+
+        await client.request("DELETE", f"/games/{game_id}")
+    finally:
+        await client.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(host, port, games, moves_per_game, time_control, max_depth):
+    latencies, errors = [], []
+    start_time = time.perf_counter()
+    await asyncio.gather(*(play_game(host, port, moves_per_game, time_control, max_depth, latencies, errors)
+                           for _ in range(games)))
+    time_taken = time.perf_counter() - start_time
+
+    print(f"{games} concurrent games, {len(latencies)} moves in {time_taken:.2f}s")
+    if latencies:
+        print(f"Moves per second: {len(latencies) / time_taken:.1f}")
+        print(f"Move latency p50: {percentile(latencies, 0.5) * 1000:.1f}ms, "
+              f"p99: {percentile(latencies, 0.99) * 1000:.1f}ms")
+    if errors:
+        print(f"{len(errors)} errors, first: {errors[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a running game server with many concurrent games")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--moves", type=int, default=10, help="human moves per game")
+    parser.add_argument("--initial", type=float, default=300)
+    parser.add_argument("--increment", type=float, default=0)
+    parser.add_argument("--max-depth", type=int, default=2, help="caps the bot search so runs are comparable")
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.games, args.moves,
+                    {"initial": args.initial, "increment": args.increment}, args.max_depth))
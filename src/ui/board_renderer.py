@@ -11,6 +11,7 @@ class BoardRenderer:
         self.pieces = self.load_pieces()
         self.colors = {"square dark" : "#7e945e", "square light": "#eaecd3"}
         self.dragging = False
+        self.analysis_surface = None  # reused by draw_analysis_arrows
 
     def load_pieces(self):
         """Extracts and stores chess piece images from spritesheet."""
@@ -114,6 +115,25 @@ class BoardRenderer:
         pygame.draw.polygon(arrow_surface, color, [arrow_tip, left, right])
         screen.blit(arrow_surface, (0, 0))
 
+    def draw_analysis_arrows(self, screen, top_moves, turn):
+        """
+        Draws engine candidate moves as arrows, the best one most opaque and the rest
+        fading with how much worse they score for the side to move.
+        :param top_moves: [(move, score from white's point of view), ...], best first
+        """
+        if not top_moves:
+            return
+        if self.analysis_surface is None or self.analysis_surface.get_size() != screen.get_size():
+            self.analysis_surface = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
+
+        best_score = top_moves[0][1]
+        # draw the weakest first so the best arrow ends up on top
+        for move, score in reversed(top_moves):
+            loss = (best_score - score) if turn else (score - best_score)
+            alpha = max(40, int(200 * math.exp(-max(loss, 0) / 100)))
+            self.analysis_surface.fill((0, 0, 0, 0))
+            self.draw_arrow(screen, self.analysis_surface, (38, 110, 200, alpha), move)
+
     def square_to_pixel(self, square):
         file = chess.square_file(square)
         rank = chess.square_rank(square)
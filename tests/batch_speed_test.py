@@ -0,0 +1,46 @@
+from src.chess_bot.evaluation import Evaluation
+from src.chess_bot.batch_evaluation import BatchEvaluation, board_to_bitboards, boards_to_bitboards
+import chess
+import numpy as np
+import random
+import time
+
+# Random playouts give a spread of openings, middle games and endings
+random.seed(0)
+boards = []
+while len(boards) < 20000:
+    board = chess.Board()
+    for _ in range(random.randint(0, 150)):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(random.choice(moves))
+    boards.append(board.copy(stack=False))
+colors = [board.turn for board in boards]
+
+evaluation = Evaluation()
+batch = BatchEvaluation(evaluation)
+
+start_time = time.time()
+scalar = [evaluation.evaluate_material(board) + evaluation.evaluate_piece_tables(board, color)
+          for board, color in zip(boards, colors)]
+scalar_time = time.time() - start_time
+
+start_time = time.time()
+batch_scores = batch.evaluate_boards(boards, colors)
+boards_time = time.time() - start_time
+
+bitboards = boards_to_bitboards(boards)
+assert bitboards.tolist() == [board_to_bitboards(board) for board in boards], "bulk bitboards do not match"
+start_time = time.time()
+bitboard_scores = batch.evaluate_bitboards(bitboards, colors)
+bitboards_time = time.time() - start_time
+
+assert batch_scores.tolist() == scalar, "batch evaluation does not match the scalar evaluator"
+assert bitboard_scores.tolist() == scalar, "bitboard evaluation does not match the scalar evaluator"
+
+print(f"Scalar: {scalar_time:.4f}s, {scalar_time / len(boards) * 1e6:.2f}us per position")
+print(f"Batch (boards): {boards_time:.4f}s, {scalar_time / boards_time:.1f}x")
+print(f"Batch (bitboards): {bitboards_time:.4f}s, {scalar_time / bitboards_time:.1f}x")
+# the bitboard path is the supported fast one, evaluate_boards also reads every chess.Board in Python
+assert scalar_time / bitboards_time >= 10, "bitboard evaluation is under 10x the scalar evaluator"
@@ -0,0 +1,35 @@
+from src.chess_bot.bot import ChessBot
+import chess
+import time
+
+# Won KRK and KPK positions, played out bot against bot with the bitbases until checkmate
+POSITIONS = [
+    ("8/8/8/4k3/8/8/8/R3K3 w - - 0 1", chess.WHITE),
+    ("8/8/3k4/8/8/2K5/8/7R w - - 0 1", chess.WHITE),
+    ("8/8/8/8/8/2k5/8/R6K b - - 0 1", chess.WHITE),
+    ("8/8/8/8/8/2K5/8/r6k w - - 0 1", chess.BLACK),
+    ("8/3P4/8/8/8/8/2k5/6K1 w - - 0 1", chess.WHITE),
+    ("8/8/k7/7K/8/6P1/8/8 w - - 0 1", chess.WHITE),
+    ("8/4p3/8/8/8/8/2K5/4k3 b - - 0 1", chess.BLACK),
+]
+MAX_PLIES = 150
+
+
+def play_out(fen, depth=4):
+    bot = ChessBot()
+    board = chess.Board(fen)
+    while not board.is_game_over(claim_draw=True) and len(board.move_stack) < MAX_PLIES:
+        bot.transposition_table.clear()
+        _, move, _, _ = bot.search(board, depth=depth)
+        board.push(move)
+    return board
+
+
+for fen, winner in POSITIONS:
+    start_time = time.time()
+    board = play_out(fen)
+    outcome = board.outcome(claim_draw=True)
+    print(f"{fen}: {outcome.termination.name if outcome else 'unfinished'} after {len(board.move_stack)} plies, "
+          f"{time.time() - start_time:.1f}s")
+    assert board.is_checkmate() and outcome.winner == winner, f"{fen} was not won, ended {board.fen()}"
+print("All endings won")
@@ -0,0 +1,6 @@
+from src.chess_bot.perft import run_reference_suite
+
+# Reference positions up to depth 3, fast enough to run after any move generator change,
+# use python -m chess_bot.perft --suite --depth 5 from src for the full counts
+assert run_reference_suite(max_depth=3, workers=1), "perft counts do not match the reference positions"
+print("All perft counts match")
@@ -1,15 +1,41 @@
 from src.chess_bot.chess_board import ChessBoard
 from src.chess_bot.bot import ChessBot
+from src.chess_bot.profiler import profile_search
+import sys
 import time
 
+# python speed_test.py --profile adds a per phase breakdown and writes cProfile and flamegraph output
+PROFILE = "--profile" in sys.argv
+
 board = ChessBoard()
-bot = ChessBot()
 
-# Test Python minimax
-start_time = time.time()
-# Original minimax call
-python_eval, python_move = bot.minimax(board.get_board_state(), 6, -float('inf'), float('inf'), board.get_board_state().turn)
-python_time = time.time() - start_time
 
+def run_search(use_attack_terms, use_pawn_structure, use_eval_cache, depth=6):
+    bot = ChessBot()
+    bot.evaluation.use_attack_terms = use_attack_terms
+    bot.evaluation.use_pawn_structure = use_pawn_structure
+    bot.evaluation.use_eval_cache = use_eval_cache
+
+    start_time = time.time()
+    bot.minimax(board.get_board_state(), depth, -float('inf'), float('inf'), board.get_board_state().turn)
+    time_taken = time.time() - start_time
+
+    return time_taken, bot
+
+
+# Test Python minimax with the optional evaluation terms and the eval cache switched on one at a time
+for use_attack_terms, use_pawn_structure, use_eval_cache, label in [
+    (False, False, False, "base"),
+    (True, False, False, "attack terms"),
+    (False, True, False, "pawn structure"),
+    (True, True, False, "all terms"),
+    (True, True, True, "all terms + eval cache"),
+]:
+    python_time, bot = run_search(use_attack_terms, use_pawn_structure, use_eval_cache)
+    print(f"Python ({label}): {python_time:.4f}s")
+    print(f"    {bot.format_search_stats(python_time)}")
 
-print(f"Python: {python_time:.4f}s")
\ No newline at end of file
+if PROFILE:
+    print("\nPhase breakdown (all terms + eval cache):")
+    profile_search(ChessBot(), board.get_board_state(), 5,
+                   cprofile_path="speed_test.prof", collapsed_path="speed_test.folded")